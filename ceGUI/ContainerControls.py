@@ -4,15 +4,29 @@ functionality.
 """
 
 import ceGUI
+import functools
 import os
+import weakref
 import wx
 import sys
 
 __all__ = ["BaseContainer", "Dialog", "Frame", "Panel", "PreviewFrame",
            "ScrolledPanel", "StandardDialog", "TopLevelFrame"]
 
+# sizer flag combinations used on every field and button layout, computed
+# once instead of at each call site
+_LABEL_FLAG = wx.ALIGN_CENTER_VERTICAL
+_FIELD_FLAG = wx.ALIGN_CENTER_VERTICAL | wx.EXPAND
+_BUTTON_FLAG = wx.ALL | wx.ALIGN_CENTER_VERTICAL
+
+# cache of window geometry settings keyed on the full settings name; windows
+# of the same class are opened repeatedly so the parse of the stored value is
+# only performed once; writes go through the cache to keep it current
+_geometrySettingsCache = {}
+
 
 class BaseContainer(ceGUI.BaseControl):
+    __slots__ = ()
     continueQueryMessage = "Do you want to save your changes?"
     continueQueryTitle = "Confirmation"
     saveSize = savePosition = bindClose = True
@@ -22,63 +36,123 @@ class BaseContainer(ceGUI.BaseControl):
     defaultWidth = None
     minSize = None
     closing = False
+    _sizeToRestore = None
+    _lastSavedWidth = None
+    _lastSavedSize = None
+    _lastSavedPosition = None
 
     def _Initialize(self):
         if self.minSize is not None:
             self.SetMinSize(self.minSize)
-        super(BaseContainer, self)._Initialize()
+        with ceGUI.FrozenContext(self):
+            super(BaseContainer, self)._Initialize()
         self.createdSuccessfully = True
 
+    def _PostInit(self, instanceName):
+        """Complete construction once the wx base class has been
+           initialized; shared by the subclass constructors so the sequence
+           is only spelled out once."""
+        self.instanceName = instanceName
+        self._Initialize()
+
     def _OnClose(self, event):
         self.closing = True
         self._SaveSettings()
         self.OnClose(event)
 
+    def _BindCloseEvent(self):
+        """Bind the close event through a weak reference; a bound method in
+           the event table would otherwise keep the container and its entire
+           widget tree alive until the handler table is torn down."""
+        methodRef = weakref.WeakMethod(self._OnClose)
+        def handler(event):
+            method = methodRef()
+            if method is None:
+                event.Skip()
+            else:
+                method(event)
+        self.Bind(wx.EVT_CLOSE, handler)
+
     def _OnCreate(self):
         if self.bindClose:
-            self.Bind(wx.EVT_CLOSE, self._OnClose)
+            self._BindCloseEvent()
         self.OnCreate()
         topSizer = self.OnLayout()
         if topSizer is not None:
             self._OnLayout(topSizer)
         self._RestoreSettings()
 
+    def _GetSizeToRestore(self):
+        """Return the size which will be restored from the settings, if any;
+           the value is cached since it is needed both when laying out the
+           window (to avoid a pointless fit) and when restoring settings."""
+        if self.saveWidthOnly or not self.saveSize:
+            return None
+        if self._sizeToRestore is None:
+            self._sizeToRestore = self._ReadGeometrySetting("Size",
+                    self.defaultSize or self.minSize, converter = eval)
+        return self._sizeToRestore
+
+    def _ReadGeometrySetting(self, name, defaultValue = None,
+            converter = None):
+        key = self._GetSettingsName(name)
+        if key not in _geometrySettingsCache:
+            _geometrySettingsCache[key] = self.config.ReadSetting(key,
+                    defaultValue, converter = converter)
+        return _geometrySettingsCache[key]
+
+    def _WriteGeometrySetting(self, name, value):
+        key = self._GetSettingsName(name)
+        _geometrySettingsCache[key] = value
+        self.config.WriteSetting(key, value)
+
     def _OnLayout(self, topSizer):
         self.SetSizer(topSizer)
-        if self.minSize is None:
+        if self.minSize is None and self._GetSizeToRestore() is None:
             topSizer.Fit(self)
 
     def _RestoreSettings(self):
         if self.saveWidthOnly:
-            width = self.ReadSetting("Width", self.defaultWidth,
+            width = self._ReadGeometrySetting("Width", self.defaultWidth,
                     converter = int)
             if width is not None:
                 height = self.Size.height
                 self.SetSize((width, height))
+                self._lastSavedWidth = width
         elif self.saveSize:
-            size = self.ReadSetting("Size", self.defaultSize or self.minSize,
-                    converter = eval)
+            size = self._GetSizeToRestore()
             if size is not None:
                 self.SetSize(size)
+                self._lastSavedSize = tuple(size)
         if self.savePosition:
-            position = self.ReadSetting("Position", converter = eval)
+            position = self._ReadGeometrySetting("Position",
+                    converter = eval)
             if position is not None:
                 self.SetPosition(position)
+                self._lastSavedPosition = tuple(position)
         self.RestoreSettings()
 
     def _SaveSettings(self):
         if not hasattr(self, "IsIconized") or not self.IsIconized():
             if self.saveWidthOnly:
-                width = self.Size.width
-                self.WriteSetting("Width", width)
+                width = int(self.Size.width)
+                if width != self._lastSavedWidth:
+                    self._lastSavedWidth = width
+                    self._WriteGeometrySetting("Width", width)
             elif self.saveSize:
-                width, height = self.Size
-                self.WriteSetting("Size", (width, height))
+                width, height = self.GetSize()
+                size = (int(width), int(height))
+                if size != self._lastSavedSize:
+                    self._lastSavedSize = size
+                    self._WriteGeometrySetting("Size", size)
             if self.savePosition:
-                x, y = self.Position
-                self.WriteSetting("Position", (x, y))
+                x, y = self.GetPosition()
+                position = (int(x), int(y))
+                if position != self._lastSavedPosition:
+                    self._lastSavedPosition = position
+                    self._WriteGeometrySetting("Position", position)
         self.SaveSettings()
-        self.settings.Flush()
+        ceGUI.ScheduleFlush(self.settings)
 
     def AddButton(self, label = "", method = None, size = (-1, -1),
             style = 0, passEvent = True, enabled = True):
@@ -164,14 +238,15 @@ class BaseContainer(ceGUI.BaseControl):
         return True
 
     def CreateFieldLayout(self, *controls):
-        numRows = len(controls) / 2
+        if len(controls) == 1 and isinstance(controls[0], (list, tuple)):
+            controls = controls[0]
+        numRows = len(controls) // 2
         sizer = wx.FlexGridSizer(rows = numRows, cols = 2, vgap = 5, hgap = 5)
         sizer.AddGrowableCol(1)
-        for index, control in enumerate(controls):
-            flag = wx.ALIGN_CENTER_VERTICAL
-            if index % 2 == 1:
-                flag |= wx.EXPAND
-            sizer.Add(control, flag = flag)
+        controlIter = iter(controls)
+        for label, field in zip(controlIter, controlIter):
+            sizer.Add(label, flag = _LABEL_FLAG)
+            sizer.Add(field, flag = _FIELD_FLAG)
         return sizer
 
     def OnClose(self, event):
@@ -206,8 +281,7 @@ class Dialog(BaseContainer, wx.Dialog):
     def __init__(self, parent = None, instanceName = None):
         wx.Dialog.__init__(self, parent, title = self.title,
                 style = self.style)
-        self.instanceName = instanceName
-        self._Initialize()
+        self._PostInit(instanceName)
 
     def _OnCreate(self):
         if self.createCloseButton:
@@ -250,11 +324,19 @@ class Frame(BaseContainer, wx.Frame):
     hasIcon = False
     title = ""
 
+    # cache of toolbar bitmaps keyed by (bitmapId, size), shared by all
+    # frames so that repeated icons are only fetched from the art provider
+    # once
+    _toolbarBitmapCache = {}
+    _toolbarRealized = False
+    _toolbarRealizePending = False
+    _toolbarHandlers = None
+    _menuHandlers = None
+
     def __init__(self, parent = None, instanceName = None):
         wx.Frame.__init__(self, parent, title = self.title, style = self.style)
-        self.instanceName = instanceName
         try:
-            self._Initialize()
+            self._PostInit(instanceName)
         except:
             self.Destroy()
             raise
@@ -262,13 +344,19 @@ class Frame(BaseContainer, wx.Frame):
     def _OnCreate(self):
         if self.hasToolbar:
             self.toolbar = wx.ToolBar(self)
-            self.SetToolBar(self.toolbar)
             self.OnCreateToolbar()
-            self.toolbar.Realize()
+            # a toolbar left empty at creation is kept unattached so that it
+            # takes up no space; it is attached on demand if items are added
+            # to it later
+            if self.toolbar.GetToolsCount() > 0:
+                self.SetToolBar(self.toolbar)
+                self.toolbar.Realize()
+            self._toolbarRealized = True
         if self.hasMenus:
             self.menuBar = wx.MenuBar()
-            self.SetMenuBar(self.menuBar)
             self.OnCreateMenus()
+            if self.menuBar.GetMenuCount() > 0:
+                self.SetMenuBar(self.menuBar)
         super(Frame, self)._OnCreate()
         if self.hasIcon:
             self.OnSetIcon()
@@ -276,32 +364,95 @@ class Frame(BaseContainer, wx.Frame):
     def AddMenu(self, label):
         menu = ceGUI.Menu()
         menu.AddToMenuBar(self.menuBar, label)
+        if self.GetMenuBar() is None:
+            self.SetMenuBar(self.menuBar)
         return menu
 
+    def _OnMenuEvent(self, event):
+        handler = self._menuHandlers.get(event.GetId())
+        if handler is None:
+            event.Skip()
+        else:
+            handler(event)
+
+    def _RegisterMenuHandler(self, item, method, createBusyCursor,
+            passEvent):
+        if self._menuHandlers is None:
+            self._menuHandlers = {}
+            self.Bind(wx.EVT_MENU, self._OnMenuEvent)
+        self._menuHandlers[item.GetId()] = ceGUI.EventHandler(self, item,
+                wx.EVT_MENU, method, createBusyCursor = createBusyCursor,
+                skipEvent = False, passEvent = passEvent, connect = False)
+
     def AddMenuItem(self, menu, label, helpString = "", method = None,
             createBusyCursor = False, passEvent = True, radio = False,
             checkable = False, windowName = None, enabled = True):
-        return menu.AddEntry(self, label, helpString, method, createBusyCursor,
-                passEvent, radio, checkable, windowName, enabled)
+        if windowName is not None:
+            method = functools.partial(self.SimpleOpenWindow, windowName)
+            passEvent = False
+        item = menu.AddEntry(self, label, helpString, None, createBusyCursor,
+                passEvent, radio, checkable, None, enabled)
+        if method is not None:
+            self._RegisterMenuHandler(item, method, createBusyCursor,
+                    passEvent)
+        return item
 
     def AddStockMenuItem(self, menu, stockId, method = None,
             createBusyCursor = False, enabled = True, passEvent = True):
-        return menu.AddStockEntry(self, stockId, method, createBusyCursor,
+        item = menu.AddStockEntry(self, stockId, None, createBusyCursor,
                 enabled, passEvent = passEvent)
+        if method is not None:
+            self._RegisterMenuHandler(item, method, createBusyCursor,
+                    passEvent)
+        return item
 
     def AddToolbarItem(self, label, bitmapId, shortHelp = "", longHelp = "",
             method = None, createBusyCursor = False, passEvent = True,
             enabled = True):
-        bitmap = wx.ArtProvider.GetBitmap(bitmapId, wx.ART_TOOLBAR,
-                self.toolbar.GetToolBitmapSize())
+        size = self.toolbar.GetToolBitmapSize()
+        key = (bitmapId, tuple(size))
+        bitmap = Frame._toolbarBitmapCache.get(key)
+        if bitmap is None:
+            bitmap = wx.ArtProvider.GetBitmap(bitmapId, wx.ART_TOOLBAR, size)
+            Frame._toolbarBitmapCache[key] = bitmap
         item = self.toolbar.AddTool(-1, label, bitmap, shortHelp)
         if not enabled:
             item.Enable(False)
         if method is not None:
-            self.BindEvent(item, wx.EVT_TOOL, method,
-                    createBusyCursor = createBusyCursor, passEvent = passEvent)
+            self._RegisterToolbarHandler(item, method, createBusyCursor,
+                    passEvent)
+        if self._toolbarRealized and not self._toolbarRealizePending:
+            self._toolbarRealizePending = True
+            wx.CallAfter(self._RealizeToolbar)
         return item
 
+    def _RealizeToolbar(self):
+        """Realize the toolbar after items have been added to it once the
+           frame has already been created; multiple additions made in the
+           same event cycle are coalesced into a single realize."""
+        if not self:
+            return
+        self._toolbarRealizePending = False
+        if self.GetToolBar() is None:
+            self.SetToolBar(self.toolbar)
+        self.toolbar.Realize()
+
+    def _OnToolbarEvent(self, event):
+        handler = self._toolbarHandlers.get(event.GetId())
+        if handler is None:
+            event.Skip()
+        else:
+            handler(event)
+
+    def _RegisterToolbarHandler(self, item, method, createBusyCursor,
+            passEvent):
+        if self._toolbarHandlers is None:
+            self._toolbarHandlers = {}
+            self.Bind(wx.EVT_TOOL, self._OnToolbarEvent)
+        self._toolbarHandlers[item.GetId()] = ceGUI.EventHandler(self, item,
+                wx.EVT_TOOL, method, createBusyCursor = createBusyCursor,
+                passEvent = passEvent, connect = False)
+
     def OnCreateToolbar(self):
         pass
 
@@ -325,8 +476,15 @@ class Panel(BaseContainer, wx.Panel):
     def __init__(self, parent, style = wx.TAB_TRAVERSAL,
             instanceName = None):
         wx.Panel.__init__(self, parent, style = style)
-        self.instanceName = instanceName
-        self._Initialize()
+        self._PostInit(instanceName)
+
+    def _RestoreSettings(self):
+        """Panels do not save their size or position so the geometry
+           handling of the base method is simply bypassed."""
+        self.RestoreSettings()
+
+    def _SaveSettings(self):
+        self.SaveSettings()
 
     def _DisplayNumItems(self):
         numItems = self._GetNumItems()
@@ -365,8 +523,7 @@ class ScrolledPanel(Panel, wx.ScrolledWindow):
     def __init__(self, parent, style = wx.HSCROLL | wx.VSCROLL,
             instanceName = None):
         wx.ScrolledWindow.__init__(self, parent, style = style)
-        self.instanceName = instanceName
-        self._Initialize()
+        self._PostInit(instanceName)
 
 
 class StandardDialog(Dialog):
@@ -386,9 +543,8 @@ class StandardDialog(Dialog):
 
     def _LayoutButtons(self, sizer):
         sizer.AddStretchSpacer()
-        for button in self._GetButtons():
-            sizer.Add(button, flag = wx.ALL | wx.ALIGN_CENTER_VERTICAL,
-                    border = 5)
+        sizer.AddMany([(button, 0, _BUTTON_FLAG, 5) \
+                for button in self._GetButtons()])
         return sizer
 
     def _OnLayout(self, topSizer):
@@ -420,6 +576,8 @@ class TopLevelFrame(Frame):
     preferencesDialogName = "ceGUI.PreferencesDialog"
     baseSettingsName = ""
     statusBar = None
+    _aboutDialog = None
+    _preferencesDialog = None
 
     def _DisplayNumItems(self, numItems, fieldNum = 1):
         if self.statusBar:
@@ -438,13 +596,20 @@ class TopLevelFrame(Frame):
         self.SetStatusBar(self.statusBar)
 
     def OnAbout(self, event):
-        dialog = ceGUI.AboutDialog(self)
-        dialog.ShowModal()
+        if not self._aboutDialog:
+            self._aboutDialog = ceGUI.AboutDialog(self)
+        self._aboutDialog.ShowModal()
 
     def OnEditPreferences(self, event):
-        cls = self._GetClass(self.preferencesDialogName)
-        dialog = cls(self)
-        dialog.ShowModal()
+        if not self._preferencesDialog:
+            cls = self._GetClass(self.preferencesDialogName)
+            self._preferencesDialog = cls(self)
+        else:
+            # the panes populate themselves from the saved settings only at
+            # creation; reload them so that edits cancelled during an earlier
+            # showing are not displayed (or saved) again
+            self._preferencesDialog.notebook.RestoreSettings()
+        self._preferencesDialog.ShowModal()
 
     def OnExit(self, event):
         self.Close()
@@ -7,6 +7,7 @@ import ceGUI
 import cx_Exceptions
 import cx_Logging
 import functools
+import operator
 import os
 import sys
 import wx
@@ -21,6 +22,23 @@ __all__ = [ "BooleanEditDialogColumn", "ChoiceEditDialogColumn",
             "TextEditDialogColumn" ]
 
 
+# cache of attribute getters keyed on the tuple of attribute names; fetching
+# all of the values of a row in a single call avoids one attribute lookup
+# per name
+_attrGetterCache = {}
+
+def _GetAttrValues(obj, attrNames):
+    key = tuple(attrNames)
+    getter = _attrGetterCache.get(key)
+    if getter is None:
+        getter = operator.attrgetter(*key)
+        _attrGetterCache[key] = getter
+    values = getter(obj)
+    if len(key) == 1:
+        return (values,)
+    return values
+
+
 class EditDialog(ceGUI.StandardDialog):
     dataSetClassName = "DataSet"
     saveWidthOnly = True
@@ -78,13 +96,12 @@ class EditDialog(ceGUI.StandardDialog):
             handle, row = self.dataSet.InsertRow()
             self.OnNewRow(parent, row)
         elif not self.IsUpdatedIndependently(parent):
-            values = [getattr(self.parentItem, n) \
-                    for n in self.dataSet.attrNames]
+            values = _GetAttrValues(self.parentItem, self.dataSet.attrNames)
             row = self.dataSet.rowClass(*values)
             self.dataSet.SetRows([row])
         else:
-            args = [getattr(self.parentItem, n) \
-                    for n in self.parentItem.pkAttrNames]
+            args = _GetAttrValues(self.parentItem,
+                    self.parentItem.pkAttrNames)
             self.dataSet.Retrieve(*args)
             if len(self.dataSet.rows) != 1:
                 raise cx_Exceptions.NoDataFound()
@@ -93,6 +110,9 @@ class EditDialog(ceGUI.StandardDialog):
 class DataPanel(ceGUI.Panel):
     updateSubCacheAttrName = None
     dataSetClassName = None
+    _editDialog = None
+    _editDialogKnown = False
+    _updateSubCache = None
 
     def _GetDataSet(self):
         editDialog = self._GetEditDialog()
@@ -108,7 +128,7 @@ class DataPanel(ceGUI.Panel):
         if editDialog is not None:
             return editDialog.dataSet
 
-    def _GetEditDialog(self):
+    def _FindEditDialog(self):
         item = self
         while True:
             parent = item.GetParent()
@@ -120,6 +140,15 @@ class DataPanel(ceGUI.Panel):
                 break
             item = parent
 
+    def _GetEditDialog(self):
+        """Return the edit dialog of which this panel is a part, if any; the
+           result is structurally invariant once the panel has been created
+           so the parent walk is only performed once."""
+        if not self._editDialogKnown:
+            self._editDialog = self._FindEditDialog()
+            self._editDialogKnown = True
+        return self._editDialog
+
     def _Initialize(self):
         editDialog = self._GetEditDialog()
         if editDialog is not None:
@@ -133,11 +162,20 @@ class DataPanel(ceGUI.Panel):
     def OnPostCreate(self):
         pass
 
+    def _GetUpdateSubCache(self):
+        if self._updateSubCache is None \
+                and self.updateSubCacheAttrName is not None:
+            self._updateSubCache = getattr(self.cache,
+                    self.updateSubCacheAttrName)
+        return self._updateSubCache
+
     def OnPostUpdate(self):
-        if self.updateSubCacheAttrName is not None:
-            subCache = getattr(self.cache, self.updateSubCacheAttrName)
+        subCache = self._GetUpdateSubCache()
+        if subCache is not None:
+            cache = self.cache
+            contextItem = self.dataSet.contextItem
             for row in self.dataSet.GetRows():
-                subCache.UpdateRow(self.cache, row, self.dataSet.contextItem)
+                subCache.UpdateRow(cache, row, contextItem)
 
     def OnPreUpdate(self):
         pass
@@ -150,6 +188,17 @@ class DataPanel(ceGUI.Panel):
 
 
 class DataEditPanel(DataPanel):
+    _editableColumns = None
+
+    def _GetEditableColumns(self):
+        """Return the list of editable columns, determining it at most once
+           per panel; whether a column is editable is fixed by the style of
+           its field so the list only needs to be invalidated when the set of
+           columns changes."""
+        if self._editableColumns is None:
+            self._editableColumns = \
+                    [c for c in self.columns if c.IsEditable()]
+        return self._editableColumns
 
     def _Initialize(self):
         self.columns = []
@@ -161,6 +210,7 @@ class DataEditPanel(DataPanel):
             cls = EditDialogColumn
         if field is None and constantValue is not None:
             field = self.AddTextField(editable = False)
+        self._editableColumns = None
         return cls(self, attrName, labelText, field, required, constantValue,
                 **args)
 
@@ -193,20 +243,18 @@ class DataEditPanel(DataPanel):
         return sizer
 
     def OnPostCreate(self):
-        focusControl = None
         row = self.GetRow()
         for column in self.columns:
             column.SetValue(row)
-            if focusControl is None and column.IsEditable():
-                focusControl = column.GetControlForFocus()
-        if focusControl is not None:
-            focusControl.SetFocus()
-
-    def OnPreUpdate(self):
         for column in self.columns:
             if column.IsEditable():
-                column.Verify()
-                column.Update(self.dataSet)
+                column.GetControlForFocus().SetFocus()
+                break
+
+    def OnPreUpdate(self):
+        for column in self._GetEditableColumns():
+            column.Verify()
+            column.Update(self.dataSet)
 
     def ReplaceColumn(self, origColumn, newColumn, sizer = None,
             layout = True):
@@ -217,6 +265,7 @@ class DataEditPanel(DataPanel):
         newColumn.ReplaceColumn(origColumn, sizer)
         origColumn.Destroy()
         self.columns[origIndex] = newColumn
+        self._editableColumns = None
         if layout:
             sizer.Layout()
 
@@ -224,6 +273,7 @@ class DataEditPanel(DataPanel):
 class DataMultipleRowPanel(DataPanel):
     createRetrieveButton = False
     filterArgsPerRow = 5
+    _retrievePending = False
 
     @property
     def rowControl(self):
@@ -250,6 +300,18 @@ class DataMultipleRowPanel(DataPanel):
     def IsUpdatedIndependently(self):
         return self._GetEditDialog() is None
 
+    def _PerformScheduledRetrieve(self):
+        self._retrievePending = False
+        self.Retrieve(refresh = True)
+
+    def _ScheduleRetrieve(self):
+        """Schedule a retrieval for when the event loop is next idle;
+           requests made while one is already pending are coalesced so the
+           panel only performs a single retrieval."""
+        if not self._retrievePending:
+            self._retrievePending = True
+            wx.CallAfter(self._PerformScheduledRetrieve)
+
     def OnCreate(self):
         self.filterArgs = []
         self.OnCreateFilterArgs()
@@ -257,7 +319,7 @@ class DataMultipleRowPanel(DataPanel):
             self.retrieveButton = self.AddButton("Retrieve", self.Retrieve,
                     passEvent = False)
         else:
-            wx.CallAfter(self.Retrieve, refresh = True)
+            self._ScheduleRetrieve()
         super(DataMultipleRowPanel, self).OnCreate()
         if self.dataSet is None:
             self.dataSet = self.rowControl.dataSet
@@ -438,7 +500,7 @@ class DataListPanel(DataMultipleRowPanel):
     def _OnEditItem(self, item, itemIndex, dialog):
         row = dialog.GetRow()
         self._UpdateListItem(item, row, itemIndex)
-        self._OnListChanged()
+        self._OnListChanged(itemIndex)
 
     def _OnInsertItems(self, dialog):
         row = dialog.dataSet.rows[0]
@@ -446,30 +508,43 @@ class DataListPanel(DataMultipleRowPanel):
         self._UpdateListItem(item, row)
         self.list.DeselectAll()
         self.list.SelectItem(item, ensureVisible = True)
-        self._OnListChanged()
+        self._OnListChanged(self.list.GetItemCount() - 1)
         if self.updateLabelWithCount:
             self._UpdateLabelWithCount()
 
-    def _OnListChanged(self):
+    def _OnListChanged(self, itemIndex = None):
         if self.IsUpdatedIndependently():
             self.list.dataSet.ClearChanges()
-        self.list.Refresh()
+        if itemIndex is None:
+            self.list.Refresh()
+        else:
+            self.list.RefreshItem(itemIndex)
 
     def _UpdateLabelWithCount(self):
         numRows = len(self.list.dataSet.rows)
         parent = self.GetParent().GetParent()
         parent.SetPageText(self, "%s (%s)" % (self.label, numRows))
 
+    # cache of the attribute names shared between a list item class and a
+    # row class; rows define their attributes in the class so the
+    # intersection is invariant for a given pair of classes
+    _itemAttrNamesCache = {}
+
     def _UpdateListItem(self, item, row, itemIndex = None):
-        for attrName in item.GetAttributeNames():
-            if not hasattr(row, attrName):
-                continue
-            value = getattr(row, attrName)
-            if itemIndex is None:
-                setattr(item, attrName, value)
-            else:
-                handle = self.list.rowHandles[itemIndex]
-                self.list.dataSet.SetValue(handle, attrName, value)
+        key = (type(item), type(row))
+        attrNames = self._itemAttrNamesCache.get(key)
+        if attrNames is None:
+            attrNames = [n for n in item.GetAttributeNames() \
+                    if hasattr(row, n)]
+            self._itemAttrNamesCache[key] = attrNames
+        if itemIndex is None:
+            for attrName in attrNames:
+                setattr(item, attrName, getattr(row, attrName))
+        else:
+            handle = self.list.rowHandles[itemIndex]
+            dataSet = self.list.dataSet
+            for attrName in attrNames:
+                dataSet.SetValue(handle, attrName, getattr(row, attrName))
 
     def DeleteItems(self, items):
         if self.IsUpdatedIndependently():
@@ -480,14 +555,16 @@ class DataListPanel(DataMultipleRowPanel):
             dialog.Destroy()
             if response != wx.ID_YES:
                 return False
-        for itemIndex in reversed(list(self.list.GetSelectedItemIndexes())):
-            self.list.DeleteItem(itemIndex, refresh = False)
+        with ceGUI.FrozenContext(self.list):
+            self.list.DeleteItems(self.list.GetSelectedItemIndexes(),
+                    refresh = False)
         if self.IsUpdatedIndependently():
             self.list.dataSet.Update()
-            if self.updateSubCacheAttrName is not None:
-                subCache = getattr(self.cache, self.updateSubCacheAttrName)
+            subCache = self._GetUpdateSubCache()
+            if subCache is not None:
+                cache = self.cache
                 for item in items:
-                    subCache.RemoveRow(self.cache, item)
+                    subCache.RemoveRow(cache, item)
         self._OnListChanged()
         if self.updateLabelWithCount:
             self._UpdateLabelWithCount()
@@ -555,17 +632,45 @@ class DataList(ceGUI.List):
     createContextMenu = True
     singleSelection = True
 
+    # context menus keyed on the list class; the menu structure is the same
+    # for every instance of a given class so it is only built once and the
+    # enable state of the entries is adjusted at popup time
+    _sharedContextMenus = {}
+
     def _CreateContextMenu(self):
-        self.menu = ceGUI.Menu()
-        self.refreshMenuItem = self.menu.AddEntry(self, "Refresh\tCtrl-R",
-                method = self._OnRefresh, passEvent = False)
-        self.menu.AddSeparator()
-        self.insertMenuItem = self.menu.AddEntry(self, "Insert\tCtrl-I",
-                method = self._OnInsertItems, passEvent = False)
-        self.editMenuItem = self.menu._AddEntry(self, "Edit\tCtrl-E",
-                method = self._OnEditItem, passEvent = False)
-        self.deleteMenuItem = self.menu.AddEntry(self, "Delete\tCtrl-D",
-                method = self._OnDeleteItems, passEvent = False)
+        cls = self.__class__
+        menuInfo = DataList._sharedContextMenus.get(cls)
+        if menuInfo is None:
+            menu = ceGUI.Menu()
+            refreshMenuItem = menu.AddEntry(self, "Refresh\tCtrl-R")
+            menu.AddSeparator()
+            insertMenuItem = menu.AddEntry(self, "Insert\tCtrl-I")
+            editMenuItem = menu._AddEntry(self, "Edit\tCtrl-E")
+            deleteMenuItem = menu.AddEntry(self, "Delete\tCtrl-D")
+            menuInfo = (menu, refreshMenuItem, insertMenuItem, editMenuItem,
+                    deleteMenuItem)
+            DataList._sharedContextMenus[cls] = menuInfo
+        self.menu, self.refreshMenuItem, self.insertMenuItem, \
+                self.editMenuItem, self.deleteMenuItem = menuInfo
+        self._menuDispatch = {
+            self.refreshMenuItem.GetId() : self._OnRefresh,
+            self.insertMenuItem.GetId() : self._OnInsertItems,
+            self.editMenuItem.GetId() : self._OnEditItem,
+            self.deleteMenuItem.GetId() : self._OnDeleteItems
+        }
+        self.Bind(wx.EVT_MENU, self._OnContextMenuChoice)
+
+    def _OnContextMenuChoice(self, event):
+        method = self._menuDispatch.get(event.GetId())
+        if method is None:
+            event.Skip()
+            return
+        try:
+            method()
+        except:
+            app = wx.GetApp()
+            exc = cx_Exceptions.GetExceptionInfo(*sys.exc_info())
+            app.OnException(exc, self)
 
     def _GetAccelerators(self):
         return [ ( wx.ACCEL_CTRL, ord('D'), self.deleteMenuItem.GetId() ),
@@ -605,12 +710,12 @@ class DataList(ceGUI.List):
             self.OnDeleteItems(items)
 
     def _OnEditItem(self):
-        itemIndexes = list(self.GetSelectedItemIndexes())
-        if len(itemIndexes) == 1:
-            itemIndex = itemIndexes[0]
-            item = self.GetItem(itemIndex)
-            if self.CanEditItem(item):
-                self.OnEditItem(item, itemIndex)
+        if self.GetSelectedItemCount() != 1:
+            return
+        itemIndex = self.GetNextItem(-1, state = wx.LIST_STATE_SELECTED)
+        item = self.GetItem(itemIndex)
+        if self.CanEditItem(item):
+            self.OnEditItem(item, itemIndex)
 
     def _OnInsertItems(self):
         if self.CanInsertItems():
@@ -640,9 +745,13 @@ class DataList(ceGUI.List):
         return parent._GetEditDialog() is None
 
     def OnContextMenu(self):
-        items = self.GetSelectedItems()
-        deleteEnabled = len(items) > 0 and self.CanDeleteItems(items)
-        editEnabled = len(items) == 1 and self.CanEditItem(items[0])
+        numSelected = self.GetSelectedItemCount()
+        if numSelected == 0:
+            deleteEnabled = editEnabled = False
+        else:
+            items = self.GetSelectedItems()
+            deleteEnabled = self.CanDeleteItems(items)
+            editEnabled = numSelected == 1 and self.CanEditItem(items[0])
         self.refreshMenuItem.Enable(self.CanRefreshItems())
         self.insertMenuItem.Enable(self.CanInsertItems())
         self.deleteMenuItem.Enable(deleteEnabled)
@@ -667,12 +776,29 @@ class DataList(ceGUI.List):
 
 
 class DataNotebookPanel(DataPanel):
+    createPagesOnDemand = False
 
     def _GetPageIndex(self, pageToFind):
         for pageIndex, page in enumerate(self.notebook.IterPages()):
             if page is pageToFind:
                 return pageIndex
 
+    def _MaterializePage(self, pageIndex):
+        cls = self._pendingPageClasses.pop(pageIndex, None)
+        if cls is None:
+            return
+        placeholder = self.notebook.GetPage(pageIndex)
+        page = cls(self.notebook)
+        self.notebook.RemovePage(pageIndex)
+        self.notebook.InsertPage(pageIndex, page, page.label, select = True)
+        placeholder.Destroy()
+        self._pages.append(page)
+        page.OnPostCreate()
+
+    def _OnPageChanged(self, event):
+        self._MaterializePage(event.GetSelection())
+        event.Skip()
+
     def GetPageByName(self, name):
         for page in self.notebook.IterPages():
             if page.__class__.__name__ == name:
@@ -680,10 +806,26 @@ class DataNotebookPanel(DataPanel):
 
     def OnCreate(self):
         self.notebook = ceGUI.Notebook(self)
-        for className in self.pageClassNames.split():
+        self._pendingPageClasses = {}
+        # the pages created so far, in creation order; iterating this list
+        # avoids walking the notebook (and skipping placeholders) every time
+        # the pages are visited
+        self._pages = []
+        for pageIndex, className in enumerate(self.pageClassNames.split()):
             cls = self._GetClass(className)
-            page = cls(self.notebook)
-            self.notebook.AddPage(page, page.label)
+            if self.createPagesOnDemand and pageIndex > 0:
+                # pages other than the first are replaced by a plain panel
+                # and only constructed (and retrieved) when first visited;
+                # this requires the page label to be a class attribute
+                self.notebook.AddPage(wx.Panel(self.notebook), cls.label)
+                self._pendingPageClasses[pageIndex] = cls
+            else:
+                page = cls(self.notebook)
+                self.notebook.AddPage(page, page.label)
+                self._pages.append(page)
+        if self._pendingPageClasses:
+            self.BindEvent(self.notebook, wx.EVT_NOTEBOOK_PAGE_CHANGED,
+                    self._OnPageChanged, skipEvent = False)
         self.notebook.SetSelection(0)
 
     def OnLayout(self):
@@ -693,23 +835,23 @@ class DataNotebookPanel(DataPanel):
         return sizer
 
     def OnPostCreate(self):
-        for page in self.notebook.IterPages():
+        for page in self._pages:
             page.OnPostCreate()
 
     def OnPostUpdate(self):
-        for page in self.notebook.IterPages():
+        for page in self._pages:
             page.OnPostUpdate()
 
     def OnPreUpdate(self):
-        for page in self.notebook.IterPages():
+        for page in self._pages:
             page.OnPreUpdate()
 
     def RestoreSettings(self):
-        for page in self.notebook.IterPages():
+        for page in self._pages:
             page.RestoreSettings()
 
     def SaveSettings(self):
-        for page in self.notebook.IterPages():
+        for page in self._pages:
             page.SaveSettings()
 
     def SetPageText(self, page, text):
@@ -718,6 +860,10 @@ class DataNotebookPanel(DataPanel):
 
 
 class EditDialogColumn(ceGUI.BaseControl):
+    # note that __slots__ cannot be defined here even though the base class
+    # leaves that possibility open: _Initialize() copies the application
+    # attributes onto each column and that set of names is only known at
+    # runtime
     expandField = True
 
     def __init__(self, parent, attrName, labelText, field,
@@ -727,6 +873,8 @@ class EditDialogColumn(ceGUI.BaseControl):
         self.field = field
         self.required = required
         self.constantValue = constantValue
+        if field is not None:
+            self._fieldSetValue = field.SetValue
         self._Initialize()
         parent.columns.append(self)
 
@@ -772,7 +920,7 @@ class EditDialogColumn(ceGUI.BaseControl):
             value = self.constantValue
         else:
             value = getattr(row, self.attrName)
-        self.field.SetValue(value)
+        self._fieldSetValue(value)
 
     def Update(self, dataSet):
         try:
@@ -844,6 +992,12 @@ class FileNameEditDialogColumn(EllipsisEditDialogColumn):
         self.style = style
         self.message = message
         self.extension = extension
+        if extension is not None:
+            self._wildcard = "*" + extension
+            self._normalizedExtension = os.path.normcase(extension)
+        else:
+            self._wildcard = "*.*"
+            self._normalizedExtension = None
 
     def GetDefaultDirAndFileName(self, currentValue):
         if currentValue is None:
@@ -852,18 +1006,15 @@ class FileNameEditDialogColumn(EllipsisEditDialogColumn):
 
     def OnChooseValue(self):
         dir, fileName = self.GetDefaultDirAndFileName(self.field.GetValue())
-        if self.extension is not None:
-            wildcard = "*" + self.extension
-        else:
-            wildcard = "*.*"
         parent = self.field.GetParent()
-        dialog = wx.FileDialog(parent, self.message, wildcard = wildcard,
-                defaultDir = dir, defaultFile = fileName, style = self.style)
+        dialog = wx.FileDialog(parent, self.message,
+                wildcard = self._wildcard, defaultDir = dir,
+                defaultFile = fileName, style = self.style)
         if dialog.ShowModal() == wx.ID_OK:
             fileName = dialog.GetPath()
-            if self.extension is not None:
+            if self._normalizedExtension is not None:
                 normalizedFileName = os.path.normcase(fileName)
-                if not normalizedFileName.endswith(self.extension):
+                if not normalizedFileName.endswith(self._normalizedExtension):
                     fileName += self.extension
             self.field.SetValue(fileName)
 
@@ -1097,6 +1248,12 @@ class GridEditWindow(ceGUI.Frame):
     retrievalAttrNames = None
     gridClassName = "Grid"
     hasMenus = False
+    acceleratorDefinitions = (
+            ( wx.ACCEL_CTRL, ord('D'), "deleteToolbarItem" ),
+            ( wx.ACCEL_CTRL, ord('I'), "insertToolbarItem" ),
+            ( wx.ACCEL_CTRL, ord('R'), "retrieveToolbarItem" ),
+            ( wx.ACCEL_CTRL, ord('S'), "saveToolbarItem" )
+    )
 
     def _GetGrid(self):
         gridClass = self._GetClass(self.gridClassName)
@@ -1110,12 +1267,8 @@ class GridEditWindow(ceGUI.Frame):
         self.subWindows = []
         self.panel = None
         super(GridEditWindow, self)._OnCreate()
-        accelerators = [
-            ( wx.ACCEL_CTRL, ord('D'), self.deleteToolbarItem.GetId() ),
-            ( wx.ACCEL_CTRL, ord('I'), self.insertToolbarItem.GetId() ),
-            ( wx.ACCEL_CTRL, ord('R'), self.retrieveToolbarItem.GetId() ),
-            ( wx.ACCEL_CTRL, ord('S'), self.saveToolbarItem.GetId() )
-        ]
+        accelerators = [(flags, keyCode, getattr(self, attrName).GetId()) \
+                for flags, keyCode, attrName in self.acceleratorDefinitions]
         self.acceleratorTable = wx.AcceleratorTable(accelerators)
         self.SetAcceleratorTable(self.acceleratorTable)
         self.Retrieve()
@@ -1219,9 +1372,9 @@ class GridEditWindow(ceGUI.Frame):
     def RetrieveSubWindows(self):
         for subWindow in self.subWindows:
             window = subWindow.window
-            if not window:
+            if window is None:
                 continue
-            subWindow.window.Retrieve(continueQuery = False)
+            window.Retrieve(continueQuery = False)
 
     def SaveSettings(self):
         self.grid.SaveColumnWidths()
@@ -1243,12 +1396,18 @@ class SubWindow(object):
         self.button = wx.Button(parent, -1, label)
         self.window = None
 
+    def _OnWindowDestroyed(self, event):
+        if event.GetEventObject() is self.window:
+            self.window = None
+        event.Skip()
+
     def Open(self, parent):
-        if self.window:
+        if self.window is not None:
             self.window.SetFocus()
         else:
             self.window = parent.OpenWindow(self.childWindowName,
                     self.childForceNewInstance, self.childWindowInstanceName)
+            self.window.Bind(wx.EVT_WINDOW_DESTROY, self._OnWindowDestroyed)
             if self.isModal:
                 self.window.ShowModal()
             else:
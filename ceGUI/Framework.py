@@ -13,8 +13,12 @@ import sys
 __all__ = [ "AppExit", "AppTopWindow", "BusyCursorContext", "DataSet",
             "DataSetRow", "EventHandler", "EVT_THREAD_TERMINATED",
             "FilteredDataSet", "FrozenContext", "GetApp", "GetModuleItem",
-            "OpenWindow", "RequiredFieldHasNoValue", "Thread",
-            "TransactionContext"]
+            "OpenWindow", "RequiredFieldHasNoValue", "ScheduleFlush",
+            "Thread", "TransactionContext"]
+
+# settings objects with a flush currently scheduled; used to coalesce the
+# flushes performed when windows save their settings into a single one
+_pendingFlushes = set()
 
 EVT_THREAD_TERMINATED = wx.NewEventType()
 
@@ -103,17 +107,19 @@ class DataSetRow(ceDatabase.Row):
 class EventHandler(object):
 
     def __init__(self, parent, control, event, method,
-            createBusyCursor = False, skipEvent = True, passEvent = True):
+            createBusyCursor = False, skipEvent = True, passEvent = True,
+            connect = True):
         self.parent = parent
         self.method = method
         self.createBusyCursor = createBusyCursor
         self.skipEvent = skipEvent
         self.passEvent = passEvent
-        if isinstance(control, wx.Window):
-            connectControl = control
-        else:
-            connectControl = parent
-        connectControl.Connect(control.GetId(), -1, event.typeId, self)
+        if connect:
+            if isinstance(control, wx.Window):
+                connectControl = control
+            else:
+                connectControl = parent
+            connectControl.Connect(control.GetId(), -1, event.typeId, self)
 
     def __call__(self, event):
         try:
@@ -196,6 +202,21 @@ def OpenWindow(name, parent = None, forceNewInstance = False,
         return window
 
 
+def ScheduleFlush(settings):
+    """Schedule a flush of the given settings object. Multiple requests made
+       before the flush actually takes place are coalesced into a single
+       flush so that closing a window does not perform one synchronous disk
+       flush per saved setting group."""
+    if settings not in _pendingFlushes:
+        _pendingFlushes.add(settings)
+        wx.CallLater(500, _PerformScheduledFlush, settings)
+
+
+def _PerformScheduledFlush(settings):
+    _pendingFlushes.discard(settings)
+    settings.Flush()
+
+
 class RequiredFieldHasNoValue(cx_Exceptions.BaseException):
     message = "Required field has no value."
 
@@ -153,6 +153,15 @@ class List(ceGUI.BaseControl, wx.ListCtrl):
         if refresh:
             self.Refresh()
 
+    def DeleteItems(self, itemIndexes, refresh = True):
+        for itemIndex in sorted(itemIndexes, reverse = True):
+            self.SetItemState(itemIndex, 0, wx.LIST_STATE_SELECTED)
+            handle = self.rowHandles.pop(itemIndex)
+            self.dataSet.DeleteRow(handle)
+        self.SetItemCount(len(self.rowHandles))
+        if refresh:
+            self.Refresh()
+
     def DeselectAll(self):
         for itemIndex in range(len(self.rowHandles)):
             self.SetItemState(itemIndex, 0, wx.LIST_STATE_SELECTED)
@@ -200,9 +209,7 @@ class List(ceGUI.BaseControl, wx.ListCtrl):
         return self._InsertItem(pos, choice, item, refresh, ensureVisible)
 
     def OnDeleteItems(self):
-        for pos, itemIndex in enumerate(self.GetSelectedItemIndexes()):
-            self.DeleteItem(itemIndex - pos, refresh = False)
-        self.Refresh()
+        self.DeleteItems(self.GetSelectedItemIndexes())
 
     def OnGetItemText(self, itemIndex, columnIndex):
         handle = self.rowHandles[itemIndex]
@@ -222,9 +229,10 @@ class List(ceGUI.BaseControl, wx.ListCtrl):
     def RefreshFromDataSet(self):
         self.rowHandles = list(self.dataSet.rows.keys())
         self.SetItemCount(len(self.rowHandles))
-        self.Refresh()
         if self.sortOnRetrieve:
             self.SortItems()
+        else:
+            self.Refresh()
 
     def RestoreColumnWidths(self, settingsName = None):
         if settingsName is None:
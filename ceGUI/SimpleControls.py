@@ -16,13 +16,42 @@ __all__ = ["BaseControl", "Choice", "DateField",
            "DecimalField", "IntegerField", "Notebook", "TextField",
            "UpperCaseTextField"]
 
+# cached copy of the system colour used for read only text fields; populated
+# on first use since it cannot be fetched before the application exists
+_readOnlyBackgroundColour = None
+
+def _GetReadOnlyBackgroundColour():
+    global _readOnlyBackgroundColour
+    if _readOnlyBackgroundColour is None:
+        _readOnlyBackgroundColour = \
+                wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE)
+    return _readOnlyBackgroundColour
+
+
 class BaseControl(object):
+    # the mixin defines no slots of its own; instances get their dictionary
+    # from the wx class they are combined with and dynamic attributes (such
+    # as the application attributes copied in _Initialize) must remain
+    # possible
+    __slots__ = ()
     createdSuccessfully = False
     copyAppAttributes = True
     baseSettingsName = None
 
     def _GetClass(self, name):
-        return ceGUI.GetModuleItem(name, associatedObj = self)
+        """Return the class with the given name, resolving it at most once
+           per concrete class; unqualified names are resolved relative to
+           the module of the class so the cache must not be inherited."""
+        cls = self.__class__
+        cache = cls.__dict__.get("_resolvedClasses")
+        if cache is None:
+            cache = {}
+            cls._resolvedClasses = cache
+        resolvedClass = cache.get(name)
+        if resolvedClass is None:
+            resolvedClass = ceGUI.GetModuleItem(name, associatedObj = self)
+            cache[name] = resolvedClass
+        return resolvedClass
 
     def _GetSettingsName(self, name):
         baseSettingsName = self.baseSettingsName
@@ -172,7 +201,7 @@ class Notebook(BaseControl, wx.Notebook):
     def ContinueQuery(self, allowCancel = True, parent = None):
         pageIndex = 0
         for page in self.IterPages():
-            if page.PendingChanges():
+            if isinstance(page, BaseControl) and page.PendingChanges():
                 self.SetSelection(pageIndex)
                 if not page.ContinueQuery(allowCancel, parent):
                     return False
@@ -185,11 +214,13 @@ class Notebook(BaseControl, wx.Notebook):
 
     def RestoreSettings(self):
         for page in self.IterPages():
-            page.RestoreSettings()
+            if isinstance(page, BaseControl):
+                page.RestoreSettings()
 
     def SaveSettings(self):
         for page in self.IterPages():
-            page.SaveSettings()
+            if isinstance(page, BaseControl):
+                page.SaveSettings()
 
 
 class TextField(BaseControl, wx.TextCtrl):
@@ -210,9 +241,9 @@ class TextField(BaseControl, wx.TextCtrl):
             return value
 
     def SetReadOnly(self):
-        color = wx.SystemSettings.GetColour(wx.SYS_COLOUR_BTNFACE)
-        self.SetBackgroundColour(color)
-        self.SetEditable(False)
+        with ceGUI.FrozenContext(self):
+            self.SetBackgroundColour(_GetReadOnlyBackgroundColour())
+            self.SetEditable(False)
 
     def SetValue(self, value):
         if value is None: